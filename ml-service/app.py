@@ -2,12 +2,21 @@
 时序预测服务 - 使用LSTM和GRU预测PV、UV、转化率等指标
 """
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
+import orjson
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 from datetime import datetime, timedelta
+from collections import OrderedDict
+import hashlib
 import json
 import os
+import re
+import threading
+import weakref
 from dotenv import load_dotenv
 import logging
 
@@ -18,37 +27,112 @@ logger = logging.getLogger(__name__)
 # 加载环境变量
 load_dotenv()
 
+
+
+class OrjsonProvider(JSONProvider):
+    """使用orjson进行JSON序列化，比标准库json快数倍"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+            mimetype='application/json'
+        )
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+# 对JSON响应启用gzip压缩（批量预测结果较大）
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+Compress(app)
 CORS(app)
 
 # 尝试导入TensorFlow，如果失败则使用简化版本
 try:
-    from tensorflow.keras.models import Sequential
+    import tensorflow as tf
+    from tensorflow.keras.models import Sequential, load_model
     from tensorflow.keras.layers import LSTM, GRU, Dense, Dropout
     from tensorflow.keras.optimizers import Adam
-    from sklearn.preprocessing import MinMaxScaler
+    
     TENSORFLOW_AVAILABLE = True
     logger.info("TensorFlow已加载，将使用LSTM/GRU模型")
 except ImportError:
     TENSORFLOW_AVAILABLE = False
     logger.warning("TensorFlow未安装，将使用简化预测算法")
     from sklearn.linear_model import LinearRegression
-    from sklearn.preprocessing import MinMaxScaler
+
+
+# 使用过去7天的数据预测
+SEQUENCE_LENGTH = 7
+
+# 每个Keras模型对应的已编译自回归预测函数
+_rollout_functions = weakref.WeakKeyDictionary()
+
+
+def get_rollout_function(model, sequence_length):
+    """
+    获取模型的自回归预测函数（tf.function，只编译一次）
+    在图内循环完成N步预测，避免每一步都从Python调用 model.predict
+    输入形状为 [batch, sequence_length, 1]，返回 [batch, N]
+    """
+    rollout = _rollout_functions.get(model)
+    if rollout is not None:
+        return rollout
+    
+    # 闭包只持有模型的弱引用，否则字典的值会强引用自己的键，模型永远无法释放
+    model_ref = weakref.ref(model)
+    
+    @tf.function(input_signature=[
+        tf.TensorSpec([None, sequence_length, 1], tf.float32),
+        tf.TensorSpec([], tf.int32),
+    ])
+    def rollout(x, n):
+        predictions = tf.TensorArray(tf.float32, size=n)
+        
+        current_model = model_ref()
+        
+        def step(i, window, predictions):
+            next_pred = current_model(window, training=False)
+            predictions = predictions.write(i, next_pred[:, 0])
+            # 更新序列（滑动窗口）
+            window = tf.concat([window[:, 1:, :], next_pred[:, :, tf.newaxis]], axis=1)
+            return i + 1, window, predictions
+        
+        _, _, predictions = tf.while_loop(
+            lambda i, window, predictions: i < n,
+            step,
+            [tf.constant(0), x, predictions]
+        )
+        return tf.transpose(predictions.stack())
+    
+    _rollout_functions[model] = rollout
+    return rollout
 
 
 class TimeSeriesPredictor:
     """时序预测器"""
     
-    def __init__(self, model_type='lstm'):
+    def __init__(self, model_type='lstm', metric_type=None):
         """
         初始化预测器
         Args:
             model_type: 'lstm' 或 'gru'
+            metric_type: 指标类型，用于查找预训练模型
         """
         self.model_type = model_type
-        self.scaler = MinMaxScaler(feature_range=(0, 1))
+        self.metric_type = metric_type
+        # 归一化参数（最小值和取值范围），由 prepare_data 根据训练数据计算
+        self.data_min = 0.0
+        self.data_range = 1.0
         self.model = None
-        self.sequence_length = 7  # 使用过去7天的数据预测
+        self.pretrained = False
+        self.sequence_length = SEQUENCE_LENGTH
         
     def prepare_data(self, data, lookback=7):
         """
@@ -63,17 +147,27 @@ class TimeSeriesPredictor:
             raise ValueError(f"数据量不足，至少需要 {lookback + 1} 天的数据")
         
         # 转换为numpy数组
-        data = np.array(data).reshape(-1, 1)
+        data = np.asarray(data, dtype=np.float64).reshape(-1, 1)
         
-        # 归一化
-        scaled_data = self.scaler.fit_transform(data)
+        # 归一化到 [0, 1]，数据恒定时取值范围按1处理
+        self.data_min = float(data.min())
+        self.data_range = float(data.max() - data.min()) or 1.0
+        scaled_data = self.scale(data)
         
-        X, y = [], []
-        for i in range(lookback, len(scaled_data)):
-            X.append(scaled_data[i-lookback:i, 0])
-            y.append(scaled_data[i, 0])
+        # 滑动窗口：第i个样本为 [i, i+lookback) 区间，标签为第 i+lookback 个值
+        flat = scaled_data[:, 0]
+        X = sliding_window_view(flat, lookback)[:-1].copy()
+        y = flat[lookback:]
         
-        return np.array(X), np.array(y)
+        return X, y
+    
+    def scale(self, data):
+        """归一化"""
+        return (data - self.data_min) / self.data_range
+    
+    def inverse_scale(self, data):
+        """反归一化"""
+        return data * self.data_range + self.data_min
     
     def build_model(self, input_shape):
         """构建LSTM或GRU模型"""
@@ -105,7 +199,15 @@ class TimeSeriesPredictor:
         try:
             X, y = self.prepare_data(data, self.sequence_length)
             
-            if TENSORFLOW_AVAILABLE:
+            pretrained_model = PRETRAINED_MODELS.get((self.metric_type, self.model_type))
+            
+            if pretrained_model is not None:
+                # 使用启动时加载的预训练模型，只需根据当前数据拟合归一化参数
+                self.model = pretrained_model
+                self.pretrained = True
+                logger.info(f"使用预训练模型: {self.metric_type}, 模型: {self.model_type}")
+                return True
+            elif TENSORFLOW_AVAILABLE:
                 # 重塑数据为LSTM/GRU需要的格式 [samples, time_steps, features]
                 X = X.reshape((X.shape[0], X.shape[1], 1))
                 
@@ -137,48 +239,214 @@ class TimeSeriesPredictor:
         
         # 使用最后sequence_length天的数据
         last_sequence = data[-self.sequence_length:]
-        predictions = []
         
         # 归一化
-        last_sequence_scaled = self.scaler.transform(np.array(last_sequence).reshape(-1, 1))
-        
-        current_sequence = last_sequence_scaled.copy()
+        last_sequence_scaled = self.scale(np.asarray(last_sequence, dtype=np.float64).reshape(-1, 1))
         
-        for _ in range(days):
-            if TENSORFLOW_AVAILABLE:
-                # LSTM/GRU预测
-                X_input = current_sequence[-self.sequence_length:].reshape(1, self.sequence_length, 1)
-                next_pred = self.model.predict(X_input, verbose=0)[0, 0]
-            else:
-                # 线性回归预测
-                X_input = current_sequence[-self.sequence_length:].reshape(1, -1)
-                next_pred = self.model.predict(X_input)[0]
+        if TENSORFLOW_AVAILABLE and isinstance(self.model, tf.keras.Model):
+            # LSTM/GRU预测：一次调用在图内完成全部N步自回归预测
+            X_input = last_sequence_scaled.reshape(1, self.sequence_length, 1).astype(np.float32)
+            rollout = get_rollout_function(self.model, self.sequence_length)
+            predictions = rollout(X_input, days).numpy()[0]
+        else:
+            # 预分配整个序列的缓冲区，窗口每步向后滑动一位，循环内不再分配内存
+            buffer = np.empty((self.sequence_length + days, 1), dtype=np.float64)
+            buffer[:self.sequence_length] = last_sequence_scaled
             
-            predictions.append(next_pred)
+            if not TENSORFLOW_AVAILABLE:
+                # 线性回归预测：直接用系数计算，跳过每步 predict 的参数校验
+                coef = self.model.coef_
+                intercept = self.model.intercept_
             
-            # 更新序列（滑动窗口）
-            current_sequence = np.append(current_sequence, [[next_pred]], axis=0)
+            for t in range(days):
+                window = buffer[t:t + self.sequence_length]
+                if TENSORFLOW_AVAILABLE:
+                    # TFLite量化模型预测
+                    X_input = window.reshape(1, self.sequence_length, 1)
+                    next_pred = self.model.predict_on_batch(X_input)[0, 0]
+                else:
+                    next_pred = window[:, 0] @ coef + intercept
+                
+                buffer[self.sequence_length + t, 0] = next_pred
+            
+            predictions = buffer[self.sequence_length:, 0]
         
         # 反归一化
-        predictions = self.scaler.inverse_transform(np.array(predictions).reshape(-1, 1))
-        predictions = [max(0, float(p[0])) for p in predictions]  # 确保非负
+        predictions = self.inverse_scale(np.asarray(predictions, dtype=np.float64))
+        predictions = [max(0, float(p)) for p in predictions]  # 确保非负
         
         return predictions
 
 
+# 预训练模型目录（由 train_offline.py 生成）
+MODEL_DIR = os.getenv('ML_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+METRIC_TYPES = ['pv', 'uv', 'conversion_rate']
+MODEL_TYPES = ['lstm', 'gru']
+
+
+def get_pretrained_model_path(metric_type, model_type):
+    """获取预训练模型文件路径"""
+    return os.path.join(MODEL_DIR, f'{metric_type}_{model_type}.keras')
+
+
+def get_tflite_model_path(metric_type, model_type):
+    """获取量化后的TFLite模型文件路径"""
+    return os.path.join(MODEL_DIR, f'{metric_type}_{model_type}.tflite')
+
+
+class TFLiteModel:
+    """TFLite量化模型，提供与Keras模型相同的 predict_on_batch 接口"""
+    
+    def __init__(self, model_path):
+        self.interpreter = tf.lite.Interpreter(model_path=model_path)
+        # 输入形状固定为 [1, sequence_length, 1]，只需分配一次
+        self.interpreter.allocate_tensors()
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        # Interpreter 不是线程安全的
+        self.lock = threading.Lock()
+    
+    def predict_on_batch(self, X_input):
+        with self.lock:
+            self.interpreter.set_tensor(self.input_index, X_input.astype(np.float32, copy=False))
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index)
+
+
+def load_pretrained_models():
+    """启动时加载所有预训练模型"""
+    models = {}
+    if not TENSORFLOW_AVAILABLE:
+        return models
+    
+    for metric_type in METRIC_TYPES:
+        for model_type in MODEL_TYPES:
+            # 优先使用量化后的TFLite模型
+            tflite_path = get_tflite_model_path(metric_type, model_type)
+            path = get_pretrained_model_path(metric_type, model_type)
+            try:
+                if os.path.exists(tflite_path):
+                    models[(metric_type, model_type)] = TFLiteModel(tflite_path)
+                    logger.info(f"已加载TFLite量化模型: {tflite_path}")
+                elif os.path.exists(path):
+                    models[(metric_type, model_type)] = load_model(path)
+                    logger.info(f"已加载预训练模型: {path}")
+            except Exception as e:
+                logger.error(f"加载预训练模型失败 {path}: {str(e)}")
+    
+    return models
+
+
+PRETRAINED_MODELS = load_pretrained_models()
+
+
+# 已训练模型缓存（LRU），避免相同历史数据重复训练
+MODEL_CACHE_SIZE = int(os.getenv('ML_MODEL_CACHE_SIZE', 32))
+_model_cache = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+
+def get_trained_predictor(project_id, metric_type, model_type, metric_data):
+    """
+    获取已训练的预测器，命中缓存时跳过训练
+    Args:
+        project_id: 项目ID
+        metric_type: 指标类型
+        model_type: 'lstm' 或 'gru'
+        metric_data: 指标时序数据
+    Returns:
+        训练好的 TimeSeriesPredictor，训练失败时返回 None
+    """
+    data_hash = hashlib.blake2b(
+        np.asarray(metric_data, dtype=np.float64).tobytes(), digest_size=16
+    ).hexdigest()
+    key = (project_id, metric_type, model_type, data_hash)
+    
+    with _model_cache_lock:
+        predictor = _model_cache.get(key)
+        if predictor is not None:
+            _model_cache.move_to_end(key)
+            logger.info(f"命中模型缓存: {metric_type}, 模型: {model_type}")
+            return predictor
+    
+    predictor = TimeSeriesPredictor(model_type=model_type, metric_type=metric_type)
+    if not predictor.train(metric_data):
+        return None
+    
+    with _model_cache_lock:
+        _model_cache[key] = predictor
+        _model_cache.move_to_end(key)
+        while len(_model_cache) > MODEL_CACHE_SIZE:
+            _model_cache.popitem(last=False)
+    
+    return predictor
+
+
+def get_constant_value(metric_data, lookback=SEQUENCE_LENGTH):
+    """
+    判断数据是否恒定（整体方差为0，或最近lookback天完全相同）
+    Returns:
+        恒定时返回最后一个值，否则返回 None
+    """
+    data = np.asarray(metric_data, dtype=np.float64)
+    if data.std() < 1e-9 or np.ptp(data[-lookback:]) == 0:
+        return float(data[-1])
+    return None
+
+
 def calculate_conversion_rate(pv_data, uv_data):
-    """计算转化率（UV/PV）"""
+    """计算转化率（UV/PV），PV为0时转化率为0"""
     if len(pv_data) != len(uv_data):
         raise ValueError("PV和UV数据长度不一致")
     
-    conversion_rates = []
-    for pv, uv in zip(pv_data, uv_data):
-        if pv > 0:
-            conversion_rates.append(uv / pv)
-        else:
-            conversion_rates.append(0)
-    
-    return conversion_rates
+    pv = np.asarray(pv_data, dtype=np.float64)
+    uv = np.asarray(uv_data, dtype=np.float64)
+    return np.divide(uv, pv, out=np.zeros_like(pv), where=pv > 0)
+
+
+# 支持的日期格式：YYYY-MM-DD、YYYY-MM-DD HH:MM:SS、ISO格式（可带毫秒和Z）
+DATE_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?Z?)?$')
+
+
+def parse_last_date(date_str):
+    """解析历史数据中的日期字符串"""
+    match = DATE_RE.match(date_str)
+    try:
+        if match:
+            year, month, day, hour, minute, second, fraction = match.groups()
+            try:
+                return datetime(
+                    int(year), int(month), int(day),
+                    int(hour or 0), int(minute or 0), int(second or 0),
+                    int((fraction or '0').ljust(6, '0'))
+                )
+            except ValueError:
+                # 时间部分越界（如 T24:00:00、闰秒 23:59:60）时只取日期部分
+                return datetime(int(year), int(month), int(day))
+        # 其他格式只取日期部分（时间之前），兼容 2024-1-5 这样未补零的日期
+        return datetime.strptime(date_str.split('T')[0].split(' ')[0], '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"无法解析日期格式: {date_str}")
+
+
+def get_metric_column(df, column):
+    """取出一列指标数据，缺失值按0处理"""
+    if column not in df:
+        return np.zeros(len(df), dtype=np.float64)
+    return df[column].fillna(0).to_numpy(dtype=np.float64)
+
+
+def extract_metric_data(df, metric_type):
+    """
+    从历史数据中提取指标时序
+    Args:
+        df: 由 historicalData 构建的 DataFrame（每个请求只构建一次）
+        metric_type: 指标类型
+    """
+    if metric_type == 'conversion_rate':
+        # 需要PV和UV数据来计算转化率
+        return calculate_conversion_rate(get_metric_column(df, 'pv'), get_metric_column(df, 'uv'))
+    return get_metric_column(df, metric_type)
 
 
 @app.route('/health', methods=['GET'])
@@ -187,7 +455,8 @@ def health():
     return jsonify({
         'status': 'ok',
         'tensorflow_available': TENSORFLOW_AVAILABLE,
-        'model_types': ['lstm', 'gru']
+        'model_types': MODEL_TYPES,
+        'pretrained_models': [f'{metric}_{model}' for metric, model in PRETRAINED_MODELS]
     })
 
 
@@ -215,54 +484,29 @@ def predict():
             }), 400
         
         # 提取指标数据
-        if metric_type == 'conversion_rate':
-            # 需要PV和UV数据来计算转化率
-            pv_data = [item.get('pv', 0) for item in historical_data]
-            uv_data = [item.get('uv', 0) for item in historical_data]
-            metric_data = calculate_conversion_rate(pv_data, uv_data)
+        df = pd.DataFrame.from_records(historical_data)
+        metric_data = extract_metric_data(df, metric_type)
+        
+        constant_value = get_constant_value(metric_data)
+        pretrained = False
+        if constant_value is not None:
+            # 数据恒定时直接返回常数预测，无需训练模型
+            predictions = [constant_value] * days
         else:
-            metric_data = [item.get(metric_type, 0) for item in historical_data]
-        
-        # 创建预测器
-        predictor = TimeSeriesPredictor(model_type=model_type)
-        
-        # 训练模型
-        if not predictor.train(metric_data):
-            return jsonify({
-                'success': False,
-                'error': '模型训练失败'
-            }), 500
-        
-        # 进行预测
-        predictions = predictor.predict(metric_data, days=days)
-        
-        # 生成预测日期 - 处理多种日期格式
-        last_date_str = historical_data[-1]['date']
-        # 尝试解析不同格式的日期
-        date_formats = [
-            '%Y-%m-%d',  # 标准格式
-            '%Y-%m-%dT%H:%M:%S',  # ISO格式（无毫秒）
-            '%Y-%m-%dT%H:%M:%S.%f',  # ISO格式（有毫秒）
-            '%Y-%m-%dT%H:%M:%S.%fZ',  # ISO格式（带Z）
-            '%Y-%m-%d %H:%M:%S',  # 标准日期时间格式
-        ]
-        
-        last_date = None
-        for fmt in date_formats:
-            try:
-                last_date = datetime.strptime(last_date_str, fmt)
-                break
-            except ValueError:
-                continue
+            # 获取预测器（命中缓存时跳过训练）
+            predictor = get_trained_predictor(project_id, metric_type, model_type, metric_data)
+            if predictor is None:
+                return jsonify({
+                    'success': False,
+                    'error': '模型训练失败'
+                }), 500
+            
+            # 进行预测
+            predictions = predictor.predict(metric_data, days=days)
+            pretrained = predictor.pretrained
         
-        if last_date is None:
-            # 如果所有格式都失败，尝试只提取日期部分
-            try:
-                # 提取 YYYY-MM-DD 部分
-                date_part = last_date_str.split('T')[0].split(' ')[0]
-                last_date = datetime.strptime(date_part, '%Y-%m-%d')
-            except:
-                raise ValueError(f"无法解析日期格式: {last_date_str}")
+        # 生成预测日期
+        last_date = parse_last_date(historical_data[-1]['date'])
         
         prediction_dates = [
             (last_date + timedelta(days=i+1)).strftime('%Y-%m-%d')
@@ -294,8 +538,10 @@ def predict():
             'historicalData': historical_data[-14:],  # 返回最近14天的历史数据用于对比
             'modelInfo': {
                 'tensorflowAvailable': TENSORFLOW_AVAILABLE,
-                'sequenceLength': predictor.sequence_length,
-                'trainingSamples': len(metric_data) - predictor.sequence_length
+                'pretrained': pretrained,
+                'modelBypassed': constant_value is not None,
+                'sequenceLength': SEQUENCE_LENGTH,
+                'trainingSamples': len(metric_data) - SEQUENCE_LENGTH
             }
         }
         
@@ -328,47 +574,24 @@ def predict_batch():
             }), 400
         
         results = {}
+        # 只构建一次DataFrame，各指标直接按列取数据
+        df = pd.DataFrame.from_records(historical_data)
         
         for metric in metrics:
             try:
-                if metric == 'conversion_rate':
-                    pv_data = [item.get('pv', 0) for item in historical_data]
-                    uv_data = [item.get('uv', 0) for item in historical_data]
-                    metric_data = calculate_conversion_rate(pv_data, uv_data)
+                metric_data = extract_metric_data(df, metric)
+                
+                constant_value = get_constant_value(metric_data)
+                if constant_value is not None:
+                    # 数据恒定时直接返回常数预测，无需训练模型
+                    predictions = [constant_value] * days
                 else:
-                    metric_data = [item.get(metric, 0) for item in historical_data]
+                    predictor = get_trained_predictor(project_id, metric, model_type, metric_data)
+                    predictions = predictor.predict(metric_data, days=days) if predictor is not None else None
                 
-                predictor = TimeSeriesPredictor(model_type=model_type)
-                if predictor.train(metric_data):
-                    predictions = predictor.predict(metric_data, days=days)
-                    
-                    # 生成预测日期 - 处理多种日期格式
-                    last_date_str = historical_data[-1]['date']
-                    # 尝试解析不同格式的日期
-                    date_formats = [
-                        '%Y-%m-%d',  # 标准格式
-                        '%Y-%m-%dT%H:%M:%S',  # ISO格式（无毫秒）
-                        '%Y-%m-%dT%H:%M:%S.%f',  # ISO格式（有毫秒）
-                        '%Y-%m-%dT%H:%M:%S.%fZ',  # ISO格式（带Z）
-                        '%Y-%m-%d %H:%M:%S',  # 标准日期时间格式
-                    ]
-                    
-                    last_date = None
-                    for fmt in date_formats:
-                        try:
-                            last_date = datetime.strptime(last_date_str, fmt)
-                            break
-                        except ValueError:
-                            continue
-                    
-                    if last_date is None:
-                        # 如果所有格式都失败，尝试只提取日期部分
-                        try:
-                            # 提取 YYYY-MM-DD 部分
-                            date_part = last_date_str.split('T')[0].split(' ')[0]
-                            last_date = datetime.strptime(date_part, '%Y-%m-%d')
-                        except:
-                            raise ValueError(f"无法解析日期格式: {last_date_str}")
+                if predictions is not None:
+                    # 生成预测日期
+                    last_date = parse_last_date(historical_data[-1]['date'])
                     
                     prediction_dates = [
                         (last_date + timedelta(days=i+1)).strftime('%Y-%m-%d')
@@ -0,0 +1,35 @@
+"""
+Gunicorn 生产环境配置
+启动: gunicorn -c gunicorn.conf.py app:app
+"""
+import multiprocessing
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"0.0.0.0:{os.getenv('ML_SERVICE_PORT', 5000)}"
+
+# 每个worker是独立进程，各自加载模型，并发预测请求不再串行
+# 每个worker的TF算子内线程数为 TF_INTRA_OP_THREADS，默认worker数按此均分CPU核数，避免超额占用
+intra_op_threads = max(1, int(os.getenv('TF_INTRA_OP_THREADS', 2)))
+workers = int(os.getenv('ML_WORKERS', max(1, multiprocessing.cpu_count() // intra_op_threads)))
+worker_class = 'gthread'
+threads = int(os.getenv('ML_WORKER_THREADS', 2))
+
+# 未命中预训练模型时需要在线训练，超时时间放宽
+timeout = int(os.getenv('ML_WORKER_TIMEOUT', 60))
+
+
+def post_fork(server, worker):
+    """
+    worker 进程加载 app 之前限制TF线程数，避免多个worker之间争抢CPU
+    必须在TF初始化（加载预训练模型）之前设置，因此不能开启 preload_app；
+    离线训练等直接 import app 的场景不受此限制
+    """
+    try:
+        import tensorflow as tf
+    except ImportError:
+        return
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(int(os.getenv('TF_INTER_OP_THREADS', 1)))
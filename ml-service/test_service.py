@@ -3,6 +3,8 @@
 """
 import requests
 import json
+import numpy as np
+import pandas as pd
 
 def test_health():
     """测试健康检查接口"""
@@ -27,16 +29,15 @@ def test_predict():
     """测试预测接口（使用示例数据）"""
     try:
         # 生成示例历史数据（30天）
-        import datetime
-        historical_data = []
-        base_date = datetime.datetime.now() - datetime.timedelta(days=30)
-        for i in range(30):
-            date = base_date + datetime.timedelta(days=i)
-            historical_data.append({
-                "date": date.strftime("%Y-%m-%d"),
-                "pv": 1000 + i * 10 + (i % 7) * 50,  # 模拟有周期性的数据
-                "uv": 500 + i * 5 + (i % 7) * 25
-            })
+        i = np.arange(30)
+        base_date = pd.Timestamp.now() - pd.Timedelta(days=30)
+        dates = pd.date_range(base_date, periods=30, freq='D').strftime('%Y-%m-%d').tolist()
+        pv = (1000 + i * 10 + (i % 7) * 50).tolist()  # 模拟有周期性的数据
+        uv = (500 + i * 5 + (i % 7) * 25).tolist()
+        historical_data = [
+            {"date": date, "pv": p, "uv": u}
+            for date, p, u in zip(dates, pv, uv)
+        ]
         
         payload = {
             "projectId": "test-project",
@@ -0,0 +1,126 @@
+"""
+离线训练脚本 - 训练LSTM/GRU模型并保存到 models 目录
+服务启动时会自动加载这些预训练模型，预测请求无需再在线训练
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from app import (
+    TENSORFLOW_AVAILABLE,
+    MODEL_DIR,
+    METRIC_TYPES,
+    MODEL_TYPES,
+    TimeSeriesPredictor,
+    extract_metric_data,
+    get_pretrained_model_path,
+    get_tflite_model_path,
+)
+
+
+def load_historical_data(path):
+    """读取历史数据文件（与 /predict 请求中的 historicalData 格式相同）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('historicalData', [])
+    return pd.DataFrame.from_records(data)
+
+
+def build_training_set(predictor, datasets, metric_type):
+    """
+    将多个项目的历史数据合并为一个训练集
+    每个序列单独归一化，使模型学习的是序列形态而不是绝对数值
+    """
+    X_parts, y_parts = [], []
+    for df in datasets:
+        metric_data = extract_metric_data(df, metric_type)
+        try:
+            X, y = predictor.prepare_data(metric_data, predictor.sequence_length)
+        except ValueError as e:
+            print(f"⚠️  跳过数据集: {e}")
+            continue
+        X_parts.append(X)
+        y_parts.append(y)
+
+    if not X_parts:
+        return None, None
+
+    X = np.concatenate(X_parts)
+    y = np.concatenate(y_parts)
+    return X.reshape((X.shape[0], X.shape[1], 1)), y
+
+
+def export_tflite(model, sequence_length, path):
+    """
+    导出动态范围量化（int8权重）的TFLite模型
+    输入固定为 [1, sequence_length, 1]，推理时无需 resize_tensor_input
+    """
+    import tensorflow as tf
+
+    layers = []
+    for layer in model.layers:
+        config = layer.get_config()
+        config.pop('batch_input_shape', None)
+        config.pop('batch_shape', None)
+        layers.append(type(layer).from_config(config))
+
+    static_model = tf.keras.Sequential(
+        [tf.keras.Input(shape=(sequence_length, 1), batch_size=1)] + layers
+    )
+    static_model.set_weights(model.get_weights())
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(static_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def train_offline(paths, metrics, model_types, epochs):
+    """训练并保存所有指标/模型组合"""
+    if not TENSORFLOW_AVAILABLE:
+        print("❌ TensorFlow未安装，无法训练LSTM/GRU模型")
+        return False
+
+    datasets = [load_historical_data(path) for path in paths]
+    os.makedirs(MODEL_DIR, exist_ok=True)
+
+    for metric_type in metrics:
+        for model_type in model_types:
+            predictor = TimeSeriesPredictor(model_type=model_type, metric_type=metric_type)
+            X, y = build_training_set(predictor, datasets, metric_type)
+            if X is None:
+                print(f"❌ {metric_type}/{model_type}: 没有可用的训练数据")
+                continue
+
+            model = predictor.build_model(X.shape[1])
+            model.fit(X, y, epochs=epochs, batch_size=32, verbose=0, validation_split=0.1)
+
+            path = get_pretrained_model_path(metric_type, model_type)
+            model.save(path)
+            print(f"✅ {metric_type}/{model_type}: {len(X)} 个样本，已保存到 {path}")
+
+            tflite_path = get_tflite_model_path(metric_type, model_type)
+            try:
+                export_tflite(model, predictor.sequence_length, tflite_path)
+                print(f"✅ {metric_type}/{model_type}: 量化模型已保存到 {tflite_path}")
+            except Exception as e:
+                print(f"⚠️  {metric_type}/{model_type}: 导出TFLite模型失败: {e}")
+
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='离线训练时序预测模型')
+    parser.add_argument('data', nargs='+', help='历史数据JSON文件，可传入多个项目的数据')
+    parser.add_argument('--metrics', nargs='+', default=METRIC_TYPES, choices=METRIC_TYPES)
+    parser.add_argument('--models', nargs='+', default=MODEL_TYPES, choices=MODEL_TYPES)
+    parser.add_argument('--epochs', type=int, default=50)
+    args = parser.parse_args()
+
+    success = train_offline(args.data, args.metrics, args.models, args.epochs)
+    sys.exit(0 if success else 1)
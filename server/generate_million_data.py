@@ -3,23 +3,31 @@
 用于性能测试
 包含页面浏览事件，用于测试事件分析页面
 """
-import random
+import os
 import json
+import tempfile
+from itertools import product
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 try:
     import mysql.connector
     from mysql.connector import pooling
 except ImportError:
     print("请先安装 mysql-connector-python: pip install mysql-connector-python")
     exit(1)
+try:
+    import numpy as np
+except ImportError:
+    print("请先安装 numpy: pip install numpy")
+    exit(1)
 
 # 配置
 PROJECT_ID = 'perf-test-project'
 TOTAL_EVENTS = 1000000  # 100万条数据
 BATCH_SIZE = 10000  # 每批插入1万条
 DAYS = 30  # 生成30天的数据
-THREADS = 4  # 并发线程数
+THREADS = 4  # 并发线程数（插入）
+PROCESSES = min(DAYS, os.cpu_count() or 1)  # 并发进程数（生成数据）
 
 # 页面浏览事件占比（用于测试事件分析页面）
 PAGE_VIEW_RATIO = 0.4  # 40% 的事件是页面浏览
@@ -32,9 +40,14 @@ DB_CONFIG = {
     'database': 'sdk-platform',
     'charset': 'utf8mb4',
     'pool_size': 10,
-    'pool_reset_session': False
+    'pool_reset_session': False,
+    'allow_local_infile': True  # 允许 LOAD DATA LOCAL INFILE 批量导入
 }
 
+# 优先使用 LOAD DATA LOCAL INFILE 导入（比 INSERT 快很多），
+# 服务器未开启 local_infile 时自动回退到 executemany
+USE_LOAD_DATA = True
+
 # 事件类型
 EVENT_TYPES = [
     'page_view', 'click', 'scroll', 'form_submit', 
@@ -47,70 +60,172 @@ PAGES = [
     '/checkout', '/user/profile', '/search', '/category'
 ]
 
-def generate_event(project_id, start_date, day_offset, force_page_view=False):
-    """生成单个事件"""
-    current_date = start_date - timedelta(days=day_offset)
+# 来源列表
+REFERRERS = ['direct', 'google', 'baidu', 'weibo']
+
+# 设备信息取值
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0)',
+    'Mozilla/5.0 (Linux; Android 10)'
+]
+PLATFORMS = ['Windows', 'iOS', 'Android']
+SCREEN_RESOLUTIONS = ['1920x1080', '375x667', '360x640']
+
+# 非页面浏览的事件类型
+OTHER_EVENT_TYPES = [e for e in EVENT_TYPES if e != 'page_view']
+
+# 预先序列化的设备信息JSON（所有取值组合），生成事件时直接选取，无需每条都 json.dumps
+DEVICE_JSON = [
+    json.dumps({
+        'userAgent': user_agent,
+        'platform': platform,
+        'language': 'zh-CN',
+        'screenResolution': resolution
+    }, ensure_ascii=False)
+    for user_agent, platform, resolution in product(USER_AGENTS, PLATFORMS, SCREEN_RESOLUTIONS)
+]
+
+# 预先序列化的事件参数JSON前缀（duration 每条不同，生成时拼接到末尾）
+EVENT_PARAMS_PREFIX = [
+    json.dumps({
+        'page': page,
+        'title': f'页面-{page}',
+        'referrer': referrer
+    }, ensure_ascii=False)[:-1] + ', "duration": '
+    for page, referrer in product(PAGES, REFERRERS)
+]
+
+def generate_day(project_id, start_date, day_offset, count, seed):
+    """
+    批量生成某一天的事件（在子进程中运行）
+    所有随机数一次性用numpy采样，不再逐条调用 random
+    """
+    rng = np.random.default_rng(seed)
+    current_date = (start_date - timedelta(days=day_offset)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
     
     # 随机时间（0-23点）
-    hour = random.randint(0, 23)
-    minute = random.randint(0, 59)
-    second = random.randint(0, 59)
-    event_time = current_date.replace(hour=hour, minute=minute, second=second)
+    seconds = rng.integers(0, 24 * 3600, count)
+    event_times = np.datetime64(current_date, 's') + seconds.astype('timedelta64[s]')
+    timestamps = np.char.replace(np.datetime_as_string(event_times, unit='s'), 'T', ' ')
     
     # 随机用户ID
-    user_id = f'user-{random.randint(1, 100000)}'
+    user_ids = rng.integers(1, 100001, count)
     
     # 事件类型：优先生成页面浏览事件（用于测试事件分析页面）
-    if force_page_view or random.random() < PAGE_VIEW_RATIO:
-        event_name = 'page_view'
-    else:
-        event_name = random.choice([e for e in EVENT_TYPES if e != 'page_view'])
+    is_page_view = rng.random(count) < PAGE_VIEW_RATIO
+    other_events = np.array(OTHER_EVENT_TYPES)[rng.integers(0, len(OTHER_EVENT_TYPES), count)]
+    event_names = np.where(is_page_view, 'page_view', other_events)
     
-    # 随机页面
-    page = random.choice(PAGES)
-    
-    # 事件参数
-    event_params = {
-        'page': page,
-        'title': f'页面-{page}',
-        'referrer': random.choice(['direct', 'google', 'baidu', 'weibo']),
-        'duration': random.randint(1, 300)  # 停留时间（秒）
-    }
+    # 事件参数：随机页面和来源，停留时间（秒）
+    params_idx = rng.integers(0, len(EVENT_PARAMS_PREFIX), count)
+    durations = rng.integers(1, 301, count)
     
     # 设备信息
-    device_info = {
-        'userAgent': random.choice([
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
-            'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0)',
-            'Mozilla/5.0 (Linux; Android 10)'
-        ]),
-        'platform': random.choice(['Windows', 'iOS', 'Android']),
-        'language': 'zh-CN',
-        'screenResolution': random.choice(['1920x1080', '375x667', '360x640'])
-    }
+    device_idx = rng.integers(0, len(DEVICE_JSON), count)
     
-    return (
-        project_id,
-        event_name,
-        json.dumps(event_params, ensure_ascii=False),
-        user_id,
-        json.dumps(device_info, ensure_ascii=False),
-        event_time.strftime('%Y-%m-%d %H:%M:%S')
-    )
+    return [
+        (
+            project_id,
+            event_name,
+            EVENT_PARAMS_PREFIX[p] + str(duration) + '}',
+            f'user-{user_id}',
+            DEVICE_JSON[d],
+            timestamp
+        )
+        for event_name, p, duration, user_id, d, timestamp in zip(
+            event_names.tolist(), params_idx.tolist(), durations.tolist(),
+            user_ids.tolist(), device_idx.tolist(), timestamps.tolist()
+        )
+    ]
+
+INSERT_SQL = """
+INSERT INTO events 
+(project_id, event_name, event_params, user_id, device_info, timestamp) 
+VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+LOAD_DATA_SQL = """
+LOAD DATA LOCAL INFILE %s INTO TABLE events
+CHARACTER SET utf8mb4
+FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+LINES TERMINATED BY '\\n'
+(project_id, event_name, event_params, user_id, device_info, timestamp)
+"""
+
+def escape_tsv_field(value):
+    """转义 LOAD DATA 字段中的特殊字符"""
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+def load_data_batch(cursor, events):
+    """将事件写入临时TSV文件，通过 LOAD DATA LOCAL INFILE 导入"""
+    with tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', newline='\n', suffix='.tsv', delete=False
+    ) as f:
+        for event in events:
+            f.write('\t'.join(escape_tsv_field(field) for field in event))
+            f.write('\n')
+        path = f.name
+    
+    try:
+        cursor.execute(LOAD_DATA_SQL, (path,))
+    finally:
+        os.remove(path)
+
+def prepare_bulk_load(cursor):
+    """
+    批量导入前关闭索引维护并放宽日志刷盘策略
+    修改全局变量需要管理员权限，失败时跳过，返回需要恢复的原始值
+    """
+    try:
+        cursor.execute("ALTER TABLE events DISABLE KEYS")
+    except mysql.connector.Error as e:
+        print(f'⚠️  关闭索引维护失败，跳过: {e}')
+    
+    try:
+        cursor.execute("SELECT @@GLOBAL.innodb_flush_log_at_trx_commit")
+        flush_log = cursor.fetchone()[0]
+        cursor.execute("SET GLOBAL innodb_flush_log_at_trx_commit = 2")
+        return flush_log
+    except mysql.connector.Error as e:
+        print(f'⚠️  修改 innodb_flush_log_at_trx_commit 失败，跳过: {e}')
+        return None
+
+def finish_bulk_load(cursor, flush_log):
+    """批量导入完成后恢复索引维护和日志刷盘策略"""
+    try:
+        cursor.execute("ALTER TABLE events ENABLE KEYS")
+    except mysql.connector.Error as e:
+        print(f'⚠️  恢复索引维护失败: {e}')
+    
+    if flush_log is not None:
+        try:
+            cursor.execute("SET GLOBAL innodb_flush_log_at_trx_commit = %s", (flush_log,))
+        except mysql.connector.Error as e:
+            print(f'⚠️  恢复 innodb_flush_log_at_trx_commit 失败: {e}')
 
 def insert_batch(connection_pool, events):
     """批量插入事件"""
+    global USE_LOAD_DATA
     try:
         conn = connection_pool.get_connection()
         cursor = conn.cursor()
         
-        sql = """
-        INSERT INTO events 
-        (project_id, event_name, event_params, user_id, device_info, timestamp) 
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
+        # 导入期间跳过唯一性和外键检查（会话级别）
+        # 连接默认关闭autocommit，每批数据在一个事务中提交
+        cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
         
-        cursor.executemany(sql, events)
+        if USE_LOAD_DATA:
+            try:
+                load_data_batch(cursor, events)
+            except mysql.connector.Error as e:
+                print(f'LOAD DATA 导入失败，回退到 INSERT: {e}')
+                USE_LOAD_DATA = False
+        
+        if not USE_LOAD_DATA:
+            cursor.executemany(INSERT_SQL, events)
         conn.commit()
         
         cursor.close()
@@ -228,6 +343,7 @@ def generate_million_data():
     print(f'项目ID: {PROJECT_ID}')
     print(f'时间范围: {DAYS} 天')
     print(f'批量大小: {BATCH_SIZE:,} 条/批')
+    print(f'生成进程: {PROCESSES}')
     print(f'并发线程: {THREADS}')
     print(f'页面浏览事件占比: {PAGE_VIEW_RATIO*100:.0f}%')
     print('\n请确保已修改数据库配置（DB_CONFIG）')
@@ -319,35 +435,52 @@ def generate_million_data():
     
     start_date = datetime.now()
     total_inserted = 0
+    # 每天使用独立的随机数种子，保证各进程的随机序列互不相关
+    seeds = np.random.SeedSequence().spawn(DAYS)
     
-    # 使用线程池并发生成
-    with ThreadPoolExecutor(max_workers=THREADS) as executor:
-        futures = []
-        
-        for day_offset in range(DAYS):
-            # 生成当天的数据
-            day_events = []
-            for _ in range(events_per_day):
-                event = generate_event(PROJECT_ID, start_date, day_offset)
-                day_events.append(event)
-                
-                # 达到批量大小时插入
-                if len(day_events) >= BATCH_SIZE:
-                    future = executor.submit(insert_batch, connection_pool, day_events.copy())
+    # 导入前关闭索引维护
+    admin_conn = None
+    try:
+        admin_conn = connection_pool.get_connection()
+        admin_cursor = admin_conn.cursor()
+        flush_log = prepare_bulk_load(admin_cursor)
+    except Exception as e:
+        print(f'⚠️  批量导入准备失败: {e}')
+        if admin_conn is not None:
+            admin_conn.close()
+        admin_conn = None
+    
+    try:
+        # 数据生成是纯CPU计算，使用进程池绕过GIL；插入是IO操作，使用线程池
+        with ProcessPoolExecutor(max_workers=PROCESSES) as gen_executor, \
+                ThreadPoolExecutor(max_workers=THREADS) as executor:
+            gen_futures = [
+                gen_executor.submit(
+                    generate_day, PROJECT_ID, start_date, day_offset, events_per_day, seeds[day_offset]
+                )
+                for day_offset in range(DAYS)
+            ]
+            futures = []
+            
+            # 每生成完一天的数据，按批量大小分批插入
+            for gen_future in as_completed(gen_futures):
+                day_events = gen_future.result()
+                for i in range(0, len(day_events), BATCH_SIZE):
+                    future = executor.submit(insert_batch, connection_pool, day_events[i:i + BATCH_SIZE])
                     futures.append(future)
-                    day_events.clear()
             
-            # 插入剩余数据
-            if day_events:
-                future = executor.submit(insert_batch, connection_pool, day_events)
-                futures.append(future)
-        
-        # 等待所有任务完成
-        for i, future in enumerate(futures):
-            inserted = future.result()
-            total_inserted += inserted
-            if (i + 1) % 10 == 0:
-                print(f'已完成 {i + 1}/{len(futures)} 批，已插入 {total_inserted:,} 条')
+            # 等待所有任务完成
+            for i, future in enumerate(futures):
+                inserted = future.result()
+                total_inserted += inserted
+                if (i + 1) % 10 == 0:
+                    print(f'已完成 {i + 1}/{len(futures)} 批，已插入 {total_inserted:,} 条')
+    finally:
+        # 无论导入成功、出错还是被 Ctrl-C 中断，都要恢复索引维护和日志刷盘策略
+        if admin_conn is not None:
+            finish_bulk_load(admin_cursor, flush_log)
+            admin_cursor.close()
+            admin_conn.close()
     
     print(f'\n数据生成完成！')
     print(f'总计插入: {total_inserted:,} 条')
@@ -2,13 +2,25 @@
 生成过去14天的测试数据SQL脚本
 用于时序预测功能测试
 """
-import random
+import argparse
 import json
+import random
 from datetime import datetime, timedelta
+try:
+    import numpy as np
+except ImportError:
+    np = None  # 未安装 numpy 时使用纯Python逐条生成（较慢）
+try:
+    import orjson
+except ImportError:
+    orjson = None  # 未安装 orjson 时使用标准库 json
 
 # 配置
 PROJECT_ID = 'demo-project'  # 修改为您的项目ID
 DAYS = 14  # 生成14天的数据
+SQL_FILE = 'generated_test_data.sql'
+TSV_FILE = 'generated_test_data.tsv'  # LOAD DATA 导入的数据文件，与SQL脚本放在同一目录
+OUTPUT_BUFFER_SIZE = 1 << 20  # 输出文件缓冲区大小（1 MiB）
 
 # 页面列表
 PAGES = ['/home', '/products', '/product/detail', '/cart', '/checkout', 
@@ -36,210 +48,268 @@ DEVICES = [
     }
 ]
 
-def generate_sql():
-    """生成SQL插入语句"""
-    sql_statements = []
-    sql_statements.append("-- 生成过去14天的测试数据")
-    sql_statements.append(f"USE `sdk-platform`;")
-    sql_statements.append(f"SET @project_id = '{PROJECT_ID}';")
-    sql_statements.append("")
-    sql_statements.append("-- 清空现有测试数据")
-    sql_statements.append(f"DELETE FROM events WHERE project_id = '{PROJECT_ID}';")
-    sql_statements.append("")
-    sql_statements.append("INSERT INTO events (project_id, event_name, event_params, user_id, device_info, timestamp) VALUES")
+# 点击事件类型
+CLICK_EVENT_TYPES = ['点击事件1', '点击事件2', '点击事件3']
+
+# 在一天内分布事件（8:00-23:00）
+HOUR_DISTRIBUTION = {
+    # 高峰时段（10-12点，19-21点）
+    (10, 12): 0.10,  # 10%的事件
+    (19, 21): 0.12,  # 12%的事件
+    # 正常时段
+    (8, 10): 0.06,
+    (12, 19): 0.08,
+    (21, 23): 0.05
+}
+# 每小时的事件占比，默认3%，模块加载时一次性算好
+HOUR_WEIGHT = [0.03] * 24
+for (start, end), weight in HOUR_DISTRIBUTION.items():
+    HOUR_WEIGHT[start:end] = [weight / (end - start)] * (end - start)
+ACTIVE_HOURS = list(range(8, 23))
+ACTIVE_WEIGHTS = HOUR_WEIGHT[8:23]
+
+def dumps_json(obj):
+    """
+    序列化JSON字段，优先使用 orjson
+    标准库回退时使用相同的紧凑格式，两种方式生成的数据完全一致
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+def escape_tsv_field(value):
+    """转义 LOAD DATA 字段中的特殊字符"""
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+# 预先生成JSON字段（已按 LOAD DATA 规则转义），生成事件时按下标取用
+# 其余字段（项目ID、用户ID、时间）不含特殊字符，逐行拼接时无需再转义
+DEVICE_JSON = [
+    escape_tsv_field(dumps_json({
+        "userAgent": device["userAgent"],
+        "platform": device["platform"],
+        "language": device["language"],
+        "screenResolution": device["screenResolution"]
+    }))
+    for device in DEVICES
+]
+PAGE_PARAMS_JSON = [
+    escape_tsv_field(dumps_json({"page": page, "title": f"页面-{page}"}))
+    for page in PAGES
+]
+CLICK_PARAMS_JSON = [
+    escape_tsv_field(dumps_json({"element": "button", "action": t}))
+    for t in CLICK_EVENT_TYPES
+]
+
+def day_targets(rng, day_offset, is_weekend):
+    """
+    计算当天的PV和UV（有增长趋势）
+    rng 可以是 numpy Generator 或 random.Random，这里只用到 rng.random()
+    """
+    # 基础值：第1天PV=800，每天增长约3%，周末减少20%
+    base_pv = 800 + (DAYS - day_offset - 1) * 25 + int(rng.random() * 101) - 50
+    if is_weekend:
+        base_pv = int(base_pv * 0.8)
     
-    base_date = datetime.now() - timedelta(days=1)  # 从昨天开始
+    # UV约为PV的45-55%
+    base_uv = int(base_pv * (0.45 + rng.random() * 0.1))
     
-    all_values = []
+    # 添加随机波动（±15%）
+    day_pv = int(base_pv * (0.85 + rng.random() * 0.3))
+    day_uv = int(base_uv * (0.85 + rng.random() * 0.3))
     
-    for day_offset in range(DAYS):
-        current_date = base_date - timedelta(days=day_offset)
-        is_weekend = current_date.weekday() >= 5  # 周六、周日
-        
-        # 计算当天的PV和UV（有增长趋势）
-        # 基础值：第1天PV=800，每天增长约3%，周末减少20%
-        base_pv = 800 + (DAYS - day_offset - 1) * 25 + random.randint(-50, 50)
-        if is_weekend:
-            base_pv = int(base_pv * 0.8)
-        
-        # UV约为PV的45-55%
-        base_uv = int(base_pv * (0.45 + random.random() * 0.1))
-        
-        # 添加随机波动（±15%）
-        day_pv = int(base_pv * (0.85 + random.random() * 0.3))
-        day_uv = int(base_uv * (0.85 + random.random() * 0.3))
-        
-        # 确保最小值
-        day_pv = max(day_pv, 300)
-        day_uv = max(day_uv, 150)
-        
-        # 生成用户ID列表
-        user_ids = [f'user-{i+1}' for i in range(day_uv)]
-        
-        # 在一天内分布事件（8:00-23:00）
-        hour_distribution = {
-            # 高峰时段（10-12点，19-21点）
-            (10, 12): 0.10,  # 10%的事件
-            (19, 21): 0.12,  # 12%的事件
-            # 正常时段
-            (8, 10): 0.06,
-            (12, 19): 0.08,
-            (21, 23): 0.05
-        }
+    # 确保最小值
+    return max(day_pv, 300), max(day_uv, 150)
+
+def sample_day_numpy(rng, day_pv, day_uv):
+    """
+    一次性采样当天所有页面浏览事件的随机数
+    返回 (小时, 分钟, 秒, 用户编号, 页面下标, 设备下标, 点击类型下标, 点击时, 点击分, 点击秒) 十列
+    没有点击事件的行，点击类型下标为 -1
+    """
+    # 按小时权重计算每个小时应该生成的事件数，总数不超过目标事件数
+    counts_per_hour = (
+        day_pv * np.asarray(ACTIVE_WEIGHTS) * rng.uniform(0.8, 1.2, len(ACTIVE_HOURS))
+    ).astype(int).clip(min=1)
+    hours = np.repeat(ACTIVE_HOURS, counts_per_hour)[:day_pv]
+    total = len(hours)
+    minutes = rng.integers(0, 60, total)
+    seconds = rng.integers(0, 60, total)
+    
+    # 在页面浏览后，随机生成点击事件（约60%的概率），时间稍晚于页面浏览（1-30秒后）
+    # 点击时间按秒数整数运算后整列拆分为时分秒，逐行拼接时不再做算术
+    click_type_idx = np.where(
+        rng.random(total) < 0.6, rng.integers(0, len(CLICK_EVENT_TYPES), total), -1
+    )
+    click_hours, click_rest = np.divmod(
+        hours * 3600 + minutes * 60 + seconds + rng.integers(1, 31, total), 3600
+    )
+    click_minutes, click_seconds = np.divmod(click_rest, 60)
+    
+    columns = (
+        hours,
+        minutes,
+        seconds,
+        rng.integers(1, day_uv + 1, total),  # 用户编号 user-1 ~ user-{day_uv}
+        rng.integers(0, len(PAGES), total),
+        rng.integers(0, len(DEVICES), total),
+        click_type_idx,
+        click_hours,
+        click_minutes,
+        click_seconds,
+    )
+    return [column.tolist() for column in columns]
+
+def sample_day_python(rng, day_pv, day_uv):
+    """未安装 numpy 时用标准库 random 采样，返回与 sample_day_numpy 相同的十列"""
+    # 循环内频繁调用的方法先绑定为局部变量，省去每次的属性查找
+    _random = rng.random
+    _choices = rng.choices
+    seconds_range = range(60)
+    user_range = range(1, day_uv + 1)
+    columns = tuple([] for _ in range(10))
+    hours, minutes, seconds, user_nums, page_idx, device_idx, click_type_idx, click_hours, click_minutes, click_seconds = columns
+    
+    # 每个小时的随机数整批抽取，不在逐条事件中调用随机函数
+    for hour, hour_weight in zip(ACTIVE_HOURS, ACTIVE_WEIGHTS):
+        hour_events = max(1, int(day_pv * hour_weight * (0.8 + _random() * 0.4)))
+        n = min(hour_events, day_pv - len(hours))
+        hour_minutes = _choices(seconds_range, k=n)
+        hour_seconds = _choices(seconds_range, k=n)
+        hours.extend([hour] * n)
+        minutes.extend(hour_minutes)
+        seconds.extend(hour_seconds)
+        user_nums.extend(_choices(user_range, k=n))
+        page_idx.extend(_choices(range(len(PAGES)), k=n))
+        device_idx.extend(_choices(range(len(DEVICES)), k=n))
+        click_type_idx.extend(
+            c if _random() < 0.6 else -1
+            for c in _choices(range(len(CLICK_EVENT_TYPES)), k=n)
+        )
+        for m, s, delay in zip(hour_minutes, hour_seconds, _choices(range(1, 31), k=n)):
+            ch, rest = divmod(hour * 3600 + m * 60 + s + delay, 3600)
+            click_hours.append(ch)
+            click_minutes.append(rest // 60)
+            click_seconds.append(rest % 60)
+    
+    return columns
+
+def build_day_rows(base_date, day_offset, seed):
+    """
+    生成某一天的全部事件
+    返回该天所有TSV行编码后的字节串
+    """
+    current_date = base_date - timedelta(days=day_offset)
+    is_weekend = current_date.weekday() >= 5  # 周六、周日
+    
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        sample_day = sample_day_numpy
+    else:
+        rng = random.Random(seed)
+        sample_day = sample_day_python
+    
+    day_pv, day_uv = day_targets(rng, day_offset, is_weekend)
+    columns = sample_day(rng, day_pv, day_uv)
+    
+    date_prefix = current_date.strftime('%Y-%m-%d')
+    
+    # 换行符直接写在时间字段末尾（*_eol），每行只拼接一次，不再额外复制整行来追加行尾
+    rows = []
+    for h, m, s, u, p, d, c, ch, cm, cs in zip(*columns):
+        timestamp_eol = f"{date_prefix} {h:02d}:{m:02d}:{s:02d}\n"
+        user_id = f"user-{u}"
+        device_info = DEVICE_JSON[d]
         
-        events_generated = 0
-        target_events = day_pv
+        # 生成页面浏览事件
+        rows.append("\t".join((
+            PROJECT_ID, "页面浏览", PAGE_PARAMS_JSON[p], user_id, device_info, timestamp_eol
+        )))
         
-        for hour in range(8, 23):
-            # 计算当前小时应该生成的事件数
-            hour_weight = 0.03  # 默认权重
-            for (start, end), weight in hour_distribution.items():
-                if start <= hour < end:
-                    hour_weight = weight / (end - start)
-                    break
-            
-            hour_events = max(1, int(target_events * hour_weight * (0.8 + random.random() * 0.4)))
-            
-            for _ in range(hour_events):
-                if events_generated >= target_events:
-                    break
-                
-                # 随机选择用户
-                user_id = random.choice(user_ids)
-                
-                # 随机时间（当前小时内）
-                minute = random.randint(0, 59)
-                second = random.randint(0, 59)
-                event_time = current_date.replace(hour=hour, minute=minute, second=second, microsecond=0)
-                
-                # 随机页面
-                page = random.choice(PAGES)
-                
-                # 随机设备
-                device = random.choice(DEVICES)
-                
-                # 生成SQL值 - 使用JSON_OBJECT函数或转义单引号
-                # 对于JSON字符串，需要转义单引号
-                event_params_dict = {"page": page, "title": f"页面-{page}"}
-                event_params_json = json.dumps(event_params_dict, ensure_ascii=False)
-                # 转义单引号用于SQL
-                event_params_sql = event_params_json.replace("'", "''")
-                
-                device_info_dict = {
-                    "userAgent": device["userAgent"],
-                    "platform": device["platform"],
-                    "language": device["language"],
-                    "screenResolution": device["screenResolution"]
-                }
-                device_info_json = json.dumps(device_info_dict, ensure_ascii=False)
-                # 转义单引号用于SQL
-                device_info_sql = device_info_json.replace("'", "''")
-                
-                timestamp = event_time.strftime('%Y-%m-%d %H:%M:%S')
-                
-                # 生成页面浏览事件
-                value = (
-                    f"('{PROJECT_ID}', '页面浏览', '{event_params_sql}', "
-                    f"'{user_id}', '{device_info_sql}', '{timestamp}')"
-                )
-                all_values.append(value)
-                events_generated += 1
-                
-                # 在页面浏览后，随机生成点击事件（约60%的概率）
-                if random.random() < 0.6:
-                    # 随机选择点击事件类型
-                    click_event_type = random.choice(['点击事件1', '点击事件2', '点击事件3'])
-                    click_params_dict = {"element": "button", "action": click_event_type}
-                    click_params_json = json.dumps(click_params_dict, ensure_ascii=False)
-                    click_params_sql = click_params_json.replace("'", "''")
-                    
-                    # 点击事件时间稍晚于页面浏览（1-30秒后）
-                    click_time = event_time + timedelta(seconds=random.randint(1, 30))
-                    click_timestamp = click_time.strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    click_value = (
-                        f"('{PROJECT_ID}', '{click_event_type}', '{click_params_sql}', "
-                        f"'{user_id}', '{device_info_sql}', '{click_timestamp}')"
-                    )
-                    all_values.append(click_value)
-            
-            if events_generated >= target_events:
-                break
-    
-    # 组合所有SQL语句
-    for i, value in enumerate(all_values):
-        if i == len(all_values) - 1:
-            sql_statements.append(f"    {value};")
-        else:
-            sql_statements.append(f"    {value},")
-    
-    sql_statements.append("")
-    sql_statements.append("-- 查看生成的数据统计")
-    sql_statements.append("-- 页面浏览事件统计")
-    sql_statements.append("SELECT ")
-    sql_statements.append("    '页面浏览' as event_name,")
-    sql_statements.append("    DATE(timestamp) as date,")
-    sql_statements.append("    COUNT(*) as event_count,")
-    sql_statements.append("    COUNT(DISTINCT user_id) as user_count")
-    sql_statements.append("FROM events")
-    sql_statements.append(f"WHERE project_id = '{PROJECT_ID}'")
-    sql_statements.append("    AND timestamp >= DATE_SUB(NOW(), INTERVAL 14 DAY)")
-    sql_statements.append("    AND event_name = '页面浏览'")
-    sql_statements.append("GROUP BY DATE(timestamp)")
-    sql_statements.append("ORDER BY date ASC;")
-    sql_statements.append("")
-    sql_statements.append("-- 点击事件1统计")
-    sql_statements.append("SELECT ")
-    sql_statements.append("    '点击事件1' as event_name,")
-    sql_statements.append("    DATE(timestamp) as date,")
-    sql_statements.append("    COUNT(*) as event_count,")
-    sql_statements.append("    COUNT(DISTINCT user_id) as user_count")
-    sql_statements.append("FROM events")
-    sql_statements.append(f"WHERE project_id = '{PROJECT_ID}'")
-    sql_statements.append("    AND timestamp >= DATE_SUB(NOW(), INTERVAL 14 DAY)")
-    sql_statements.append("    AND event_name = '点击事件1'")
-    sql_statements.append("GROUP BY DATE(timestamp)")
-    sql_statements.append("ORDER BY date ASC;")
-    sql_statements.append("")
-    sql_statements.append("-- 点击事件2统计")
-    sql_statements.append("SELECT ")
-    sql_statements.append("    '点击事件2' as event_name,")
-    sql_statements.append("    DATE(timestamp) as date,")
-    sql_statements.append("    COUNT(*) as event_count,")
-    sql_statements.append("    COUNT(DISTINCT user_id) as user_count")
-    sql_statements.append("FROM events")
-    sql_statements.append(f"WHERE project_id = '{PROJECT_ID}'")
-    sql_statements.append("    AND timestamp >= DATE_SUB(NOW(), INTERVAL 14 DAY)")
-    sql_statements.append("    AND event_name = '点击事件2'")
-    sql_statements.append("GROUP BY DATE(timestamp)")
-    sql_statements.append("ORDER BY date ASC;")
-    sql_statements.append("")
-    sql_statements.append("-- 点击事件3统计")
-    sql_statements.append("SELECT ")
-    sql_statements.append("    '点击事件3' as event_name,")
-    sql_statements.append("    DATE(timestamp) as date,")
-    sql_statements.append("    COUNT(*) as event_count,")
-    sql_statements.append("    COUNT(DISTINCT user_id) as user_count")
-    sql_statements.append("FROM events")
-    sql_statements.append(f"WHERE project_id = '{PROJECT_ID}'")
-    sql_statements.append("    AND timestamp >= DATE_SUB(NOW(), INTERVAL 14 DAY)")
-    sql_statements.append("    AND event_name = '点击事件3'")
-    sql_statements.append("GROUP BY DATE(timestamp)")
-    sql_statements.append("ORDER BY date ASC;")
-    
-    return '\n'.join(sql_statements)
+        if c >= 0:
+            click_timestamp_eol = f"{date_prefix} {ch:02d}:{cm:02d}:{cs:02d}\n"
+            rows.append("\t".join((
+                PROJECT_ID, CLICK_EVENT_TYPES[c], CLICK_PARAMS_JSON[c], user_id, device_info, click_timestamp_eol
+            )))
+    
+    return "".join(rows).encode('utf-8')
+
+STATS_SQL = """
+-- {title}统计
+SELECT 
+    '{event_name}' as event_name,
+    DATE(timestamp) as date,
+    COUNT(*) as event_count,
+    COUNT(DISTINCT user_id) as user_count
+FROM events
+WHERE project_id = '{project_id}'
+    AND timestamp >= DATE_SUB(NOW(), INTERVAL 14 DAY)
+    AND event_name = '{event_name}'
+GROUP BY DATE(timestamp)
+ORDER BY date ASC;
+"""
+
+LOAD_DATA_SQL = """
+LOAD DATA LOCAL INFILE '{path}' INTO TABLE events
+CHARACTER SET utf8mb4
+FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+LINES TERMINATED BY '\\n'
+(project_id, event_name, event_params, user_id, device_info, timestamp);
+"""
+
+def day_seeds(seed=None):
+    """
+    为每天生成独立的随机种子，各天的数据互不影响
+    指定 seed 时结果可复现：同一天内多次运行生成的数据完全一致
+    """
+    if np is not None:
+        return np.random.SeedSequence(seed).spawn(DAYS)
+    master = random.Random(seed)
+    return [master.getrandbits(64) for _ in range(DAYS)]
+
+def write_csv(fp, seed=None):
+    """按天生成事件数据，按日期顺序写入TSV文件（二进制模式），由 LOAD DATA LOCAL INFILE 导入"""
+    base_date = datetime.now() - timedelta(days=1)  # 从昨天开始
+    seeds = day_seeds(seed)
+    for d in range(DAYS):
+        fp.write(build_day_rows(base_date, d, seeds[d]))
+
+def write_sql(fp):
+    """生成导入脚本：清空旧数据、LOAD DATA 导入TSV文件、查看统计"""
+    fp.write("-- 生成过去14天的测试数据\n")
+    fp.write("USE `sdk-platform`;\n")
+    fp.write(f"SET @project_id = '{PROJECT_ID}';\n")
+    fp.write("\n")
+    fp.write("-- 清空现有测试数据\n")
+    fp.write(f"DELETE FROM events WHERE project_id = '{PROJECT_ID}';\n")
+    fp.write("\n")
+    fp.write("-- 导入测试数据（需要 mysql --local-infile=1）")
+    fp.write(LOAD_DATA_SQL.format(path=TSV_FILE))
+    
+    fp.write("\n-- 查看生成的数据统计")
+    for title, event_name in [('页面浏览事件', '页面浏览')] + [(t, t) for t in CLICK_EVENT_TYPES]:
+        fp.write(STATS_SQL.format(title=title, event_name=event_name, project_id=PROJECT_ID))
 
 if __name__ == '__main__':
-    sql = generate_sql()
+    parser = argparse.ArgumentParser(description='生成过去14天的测试数据')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='随机种子，指定后同一天内多次运行生成的数据完全一致')
+    args = parser.parse_args()
+    
+    if np is None:
+        print("⚠️  未安装 numpy，使用纯Python逐条生成（较慢），建议: pip install numpy")
     
     # 输出到文件
-    with open('generated_test_data.sql', 'w', encoding='utf-8') as f:
-        f.write(sql)
+    with open(TSV_FILE, 'wb', buffering=OUTPUT_BUFFER_SIZE) as f:
+        write_csv(f, seed=args.seed)
+    with open(SQL_FILE, 'w', encoding='utf-8') as f:
+        write_sql(f)
     
-    print("SQL脚本已生成: generated_test_data.sql")
+    print(f"测试数据已生成: {TSV_FILE}")
+    print(f"SQL脚本已生成: {SQL_FILE}")
     print(f"预计生成约 {DAYS * 800} 条事件数据")
     print("\n使用说明：")
     print("1. 修改脚本中的 PROJECT_ID 为您的项目ID")
-    print("2. 运行: python generate_test_data.py")
-    print("3. 执行生成的SQL文件: generated_test_data.sql")
-
+    print("2. 运行: python generate_test_data.py（可加 --seed 42 生成可复现的数据）")
+    print(f"3. 在生成文件所在目录执行: mysql --local-infile=1 -u root -p < {SQL_FILE}")
+    print("   （MySQL服务端需开启 local_infile: SET GLOBAL local_infile = 1;）")
@@ -2,24 +2,111 @@
 数据库连接测试脚本
 用于诊断数据库连接问题
 """
+import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-def test_connection():
-    """测试数据库连接"""
+def import_driver():
+    """
+    导入MySQL驱动
+    优先使用 mysqlclient（基于C客户端库，速度更快），未安装时回退到 mysql-connector-python
+    返回 (驱动名称, 驱动模块)，都未安装时返回 (None, None)
+    """
+    try:
+        import MySQLdb
+        return 'mysqlclient', MySQLdb
+    except ImportError:
+        pass
+    try:
+        import mysql.connector
+        return 'mysql-connector-python', mysql.connector
+    except ImportError:
+        return None, None
+
+def connect_params(driver, config, with_database=True):
+    """将配置转换为对应驱动的连接参数"""
+    if driver.__name__ == 'MySQLdb':
+        params = {
+            'host': config['host'],
+            'user': config['user'],
+            'passwd': config['password'],
+            'charset': config['charset'],
+            'connect_timeout': 5,
+        }
+        if with_database:
+            params['db'] = config['database']
+    else:
+        params = {
+            'host': config['host'],
+            'user': config['user'],
+            'password': config['password'],
+            'charset': config['charset'],
+            'connection_timeout': 5,
+        }
+        if with_database:
+            params['database'] = config['database']
+    return params
+
+def create_pool(driver, config, pool_size):
+    """
+    创建连接池，返回获取连接的函数
+    mysqlclient 本身不带连接池，使用 DBUtils 的 PooledDB
+    """
+    if driver.__name__ == 'MySQLdb':
+        from dbutils.pooled_db import PooledDB
+        pool = PooledDB(creator=driver, mincached=1, maxcached=pool_size, **connect_params(driver, config))
+        return pool.connection
+
+    from mysql.connector import pooling
+    pool = pooling.MySQLConnectionPool(
+        pool_size=pool_size,
+        pool_reset_session=False,
+        **connect_params(driver, config)
+    )
+    return pool.get_connection
+
+def execute_multi(driver, cursor, sql, params):
+    """
+    一次往返执行多条以分号分隔的语句
+    mysqlclient 默认开启 MULTI_STATEMENTS，mysql-connector 9.2 起 execute 直接支持多语句，
+    两者都需要用 nextset 读完所有结果；更早的 mysql-connector 需要 multi=True 并遍历返回的结果迭代器
+    """
+    if driver.__name__ == 'MySQLdb' or tuple(driver.__version_info__[:2]) >= (9, 2):
+        cursor.execute(sql, params)
+        while cursor.nextset():
+            pass
+    else:
+        for _ in cursor.execute(sql, params, multi=True):
+            pass
+
+def error_code(e):
+    """获取数据库错误代码（mysql-connector 为 errno，mysqlclient 为 args[0]）"""
+    errno = getattr(e, 'errno', None)
+    if errno is None and e.args:
+        errno = e.args[0]
+    return errno
+
+def error_message(e):
+    """获取数据库错误信息"""
+    return getattr(e, 'msg', None) or (e.args[-1] if e.args else str(e))
+
+def test_connection(verbose=False):
+    """测试数据库连接，verbose 为 True 时额外输出表结构"""
     print("=" * 50)
     print("数据库连接诊断工具")
     print("=" * 50)
     
-    # 1. 检查mysql-connector-python是否安装
+    # 1. 检查MySQL驱动是否安装
     print("\n1. 检查依赖...")
-    try:
-        import mysql.connector
-        from mysql.connector import pooling
-        print("✅ mysql-connector-python 已安装")
-    except ImportError:
-        print("❌ mysql-connector-python 未安装")
-        print("   请运行: pip install mysql-connector-python")
+    driver_name, driver = import_driver()
+    if driver is None:
+        print("❌ 未安装MySQL驱动")
+        print("   请运行: pip install mysqlclient")
+        print("   或: pip install mysql-connector-python")
         return False
+    print(f"✅ 使用驱动: {driver_name}")
+    if driver_name != 'mysqlclient':
+        print("   提示: 安装 mysqlclient 可获得更好的性能（pip install mysqlclient）")
     
     # 2. 读取配置
     print("\n2. 读取数据库配置...")
@@ -36,18 +123,12 @@ def test_connection():
     print(f"   数据库: {DB_CONFIG['database']}")
     print(f"   密码: {'*' * len(DB_CONFIG['password'])}")
     
-    # 3. 测试基本连接
+    # 3. 测试基本连接（后续步骤复用这个连接，避免重复握手认证）
     print("\n3. 测试基本连接...")
     try:
-        conn = mysql.connector.connect(
-            host=DB_CONFIG['host'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            connection_timeout=5
-        )
+        conn = driver.connect(**connect_params(driver, DB_CONFIG, with_database=False))
         print("✅ 基本连接成功")
-        conn.close()
-    except mysql.connector.Error as e:
+    except driver.Error as e:
         print(f"❌ 基本连接失败: {e}")
         print("\n可能的原因：")
         print("  1. MySQL服务未启动")
@@ -56,72 +137,91 @@ def test_connection():
         print("  4. 防火墙阻止连接")
         return False
     
+    # 连接池测试需要另建连接，不依赖当前连接，放到后台线程与步骤4的查询重叠执行
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pool_future = executor.submit(probe_pool, driver, DB_CONFIG, 5)
+        try:
+            return check_database(driver, conn, DB_CONFIG, pool_future, verbose)
+        finally:
+            conn.close()
+
+def probe_pool(driver, config, pool_size):
+    """
+    创建连接池并从中获取一个连接（在后台线程中运行）
+    不直接输出，返回 (是否通过, 结果行)，由步骤5按顺序输出
+    """
+    lines = []
+    try:
+        get_pool_connection = create_pool(driver, config, pool_size)
+        lines.append("✅ 连接池创建成功")
+        
+        # 测试从连接池获取连接
+        pool_conn = get_pool_connection()
+        lines.append("✅ 从连接池获取连接成功")
+        pool_conn.close()
+    except ImportError:
+        lines.append("⚠️  未安装 DBUtils，跳过连接池测试")
+        lines.append("   mysqlclient 需要配合 DBUtils 使用连接池: pip install DBUtils")
+    except Exception as e:
+        lines.append(f"❌ 连接池测试失败: {e}")
+        return False, lines
+    return True, lines
+
+def check_database(driver, conn, DB_CONFIG, pool_future, verbose=False):
+    """使用已建立的连接测试数据库和插入操作（步骤4、6），并输出连接池测试结果（步骤5）"""
     # 4. 测试数据库是否存在
     print("\n4. 测试数据库是否存在...")
     try:
-        conn = mysql.connector.connect(
-            host=DB_CONFIG['host'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            database=DB_CONFIG['database'],
-            connection_timeout=5
-        )
+        cursor = conn.cursor()
+        cursor.execute(f"USE `{DB_CONFIG['database']}`")
         print(f"✅ 数据库 '{DB_CONFIG['database']}' 连接成功")
         
         # 检查表是否存在
-        cursor = conn.cursor()
         cursor.execute("SHOW TABLES LIKE 'events'")
         if cursor.fetchone():
             print("✅ events 表存在")
             
-            # 检查表结构
-            cursor.execute("DESCRIBE events")
-            columns = cursor.fetchall()
-            print(f"   表结构: {len(columns)} 个字段")
+            # 检查表是否可查询（LIMIT 0 不读取数据，也不需要查询数据字典）
+            cursor.execute("SELECT 1 FROM events LIMIT 0")
+            cursor.fetchall()
+            print("   表结构检查通过")
+            
+            if verbose:
+                cursor.execute("DESCRIBE events")
+                columns = cursor.fetchall()
+                print(f"   表结构: {len(columns)} 个字段")
         else:
             print("⚠️  events 表不存在，可能需要初始化数据库")
         
         cursor.close()
-        conn.close()
-    except mysql.connector.Error as e:
+    except driver.Error as e:
         print(f"❌ 数据库连接失败: {e}")
         print("\n可能的原因：")
-        if e.errno == 1049:
+        errno = error_code(e)
+        if errno == 1049:
             print("  数据库不存在，请先创建数据库")
             print(f"  运行: CREATE DATABASE `{DB_CONFIG['database']}`;")
-        elif e.errno == 1045:
+        elif errno == 1045:
             print("  用户名或密码错误")
-        elif e.errno == 2003:
+        elif errno == 2003:
             print("  无法连接到MySQL服务器")
             print("  请检查MySQL服务是否启动")
         else:
-            print(f"  错误代码: {e.errno}")
-            print(f"  错误信息: {e.msg}")
+            print(f"  错误代码: {errno}")
+            print(f"  错误信息: {error_message(e)}")
         return False
     
-    # 5. 测试连接池
+    # 5. 测试连接池（已在后台线程中执行，这里等待并输出结果）
     print("\n5. 测试连接池...")
-    try:
-        pool_config = {
-            **DB_CONFIG,
-            'pool_size': 5,
-            'pool_reset_session': False
-        }
-        connection_pool = pooling.MySQLConnectionPool(**pool_config)
-        print("✅ 连接池创建成功")
-        
-        # 测试从连接池获取连接
-        conn = connection_pool.get_connection()
-        print("✅ 从连接池获取连接成功")
-        conn.close()
-    except Exception as e:
-        print(f"❌ 连接池测试失败: {e}")
+    passed, lines = pool_future.result()
+    for line in lines:
+        print(line)
+    if not passed:
         return False
     
     # 6. 测试插入操作
     print("\n6. 测试插入操作...")
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor()
         
         # 先检查或创建测试项目（因为外键约束）
@@ -159,17 +259,19 @@ def test_connection():
         print("✅ 插入操作成功")
         
         # 删除测试数据
-        cursor.execute("DELETE FROM events WHERE project_id = %s", (test_project_id,))
-        cursor.execute("DELETE FROM projects WHERE id = %s", (test_project_id,))
+        execute_multi(
+            driver, cursor,
+            "DELETE FROM events WHERE project_id = %s; DELETE FROM projects WHERE id = %s",
+            (test_project_id, test_project_id)
+        )
         conn.commit()
         print("✅ 清理测试数据成功")
         
         cursor.close()
-        conn.close()
-    except mysql.connector.Error as e:
+    except driver.Error as e:
         print(f"❌ 插入操作失败: {e}")
-        print(f"   错误代码: {e.errno}")
-        if e.errno == 1452:
+        print(f"   错误代码: {error_code(e)}")
+        if error_code(e) == 1452:
             print("\n   原因：外键约束失败")
             print("   events 表的 project_id 必须引用 projects 表中存在的项目")
             print("   解决方法：")
@@ -191,6 +293,10 @@ def test_connection():
     return True
 
 if __name__ == '__main__':
-    success = test_connection()
+    parser = argparse.ArgumentParser(description='数据库连接诊断工具')
+    parser.add_argument('--verbose', action='store_true', help='额外执行 DESCRIBE events 输出表结构')
+    args = parser.parse_args()
+    
+    success = test_connection(verbose=args.verbose)
     sys.exit(0 if success else 1)
 